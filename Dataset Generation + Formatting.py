@@ -1,9 +1,16 @@
 import random
 import json
-import nlpaug.augmenter.word as naw
+import os
+import hashlib
+from multiprocessing import Pool
 
-# Optional: Initialize NLPAug for question paraphrasing
-paraphraser = naw.SynonymAug(aug_src='wordnet')
+# Paraphrase pool settings: each base question gets a bounded pool of
+# paraphrases built once (in parallel) and cached on disk for reuse
+PARAPHRASE_CACHE_PATH = "paraphrase_cache.json"
+PARAPHRASE_POOL_SIZE = 20
+
+# Optional: NLPAug paraphraser, created lazily once per worker process
+paraphraser = None
 
 # Expanded topics and questions
 topics = {
@@ -126,43 +133,154 @@ follow_ups = {
     "damage handling": ["Can I report damage through an app?", "What if the damage is not my fault?"]
 }
 
+# Worker initializer: build the NLPAug paraphraser once per process
+def _init_paraphraser():
+    global paraphraser
+    import nlpaug.augmenter.word as naw
+    paraphraser = naw.SynonymAug(aug_src='wordnet')
+
+def _question_seed(seed, question):
+    """Derive a stable per-question seed so results don't depend on worker scheduling."""
+    digest = hashlib.sha1(f"{seed}:{question}".encode("utf-8")).hexdigest()
+    return int(digest[:8], 16)
+
+def _paraphrase_question(args):
+    """Build up to `pool_size` unique paraphrases for one base question (runs in a worker)."""
+    question, pool_size, seed = args
+    question_seed = _question_seed(seed, question)
+    random.seed(question_seed)
+    try:
+        import numpy as np
+        np.random.seed(question_seed)
+    except ImportError:
+        pass
+
+    candidates = set()
+    # Bounded attempts: short questions may not have enough synonyms to fill the pool
+    for _ in range(pool_size * 3):
+        if len(candidates) >= pool_size:
+            break
+        candidates.update(paraphraser.augment(question, n=pool_size))
+    candidates.discard(question)
+
+    # The original question is always kept; the rest of the pool is a seeded sample
+    sampled = random.Random(question_seed).sample(sorted(candidates), min(pool_size - 1, len(candidates)))
+    return question, [question] + sampled
+
+def _cache_key(question, pool_size, seed):
+    return f"v2:{seed}:{pool_size}:{question}"
+
+def load_paraphrase_cache(path=PARAPHRASE_CACHE_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_paraphrase_cache(cache, path=PARAPHRASE_CACHE_PATH):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(cache, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+
+def build_paraphrase_pools(pool_size=PARAPHRASE_POOL_SIZE, seed=42, workers=None,
+                           cache_path=PARAPHRASE_CACHE_PATH):
+    """Return {base_question: [paraphrases]} for every question in `topics`.
+
+    Questions already in the on-disk cache are reused; the rest are paraphrased
+    in parallel worker processes and written back to the cache.
+    """
+    cache = load_paraphrase_cache(cache_path)
+    questions = sorted({q for qs in topics.values() for q in qs})
+    missing = [q for q in questions if _cache_key(q, pool_size, seed) not in cache]
+
+    if missing:
+        print(f"🔄 Building paraphrase pools for {len(missing)} question(s)...")
+        tasks = [(q, pool_size, seed) for q in missing]
+        with Pool(processes=workers, initializer=_init_paraphraser) as pool:
+            for question, paraphrases in pool.imap_unordered(_paraphrase_question, tasks):
+                cache[_cache_key(question, pool_size, seed)] = paraphrases
+        save_paraphrase_cache(cache, cache_path)
+
+    return {q: cache[_cache_key(q, pool_size, seed)] for q in questions}
+
+def unique_pair_ceiling(pools=None):
+    """Number of distinct prompt/response pairs the generator can produce with these pools."""
+    total = 0
+    for topic, questions in topics.items():
+        prompts = {p for q in questions for p in (pools[q] if pools else [q])}
+        total += len(prompts) * len(set(answers[topic]))
+    for topic, questions in follow_ups.items():
+        total += len(set(questions)) * len(set(answers[topic]))
+    return total
+
 # Generate dataset
-def generate_dataset(num_samples=1000, augment=False):
-    dataset = []
+def generate_dataset(num_samples=1000, augment=False, seed=None, pools=None):
+    """Yield Q&A samples one at a time so large datasets can be streamed to disk.
+
+    With `augment` and no `pools`, paraphrase pools are built (or loaded from
+    the cache) with `build_paraphrase_pools`.
+    """
+    if augment and pools is None:
+        pools = build_paraphrase_pools(seed=42 if seed is None else seed)
+    rng = random.Random(seed)
     topic_keys = list(topics.keys())
 
     for _ in range(num_samples):
-        topic = random.choice(topic_keys)
-        base_question = random.choice(topics[topic])
-        base_answer = random.choice(answers[topic])
+        topic = rng.choice(topic_keys)
+        base_question = rng.choice(topics[topic])
+        base_answer = rng.choice(answers[topic])
 
-        # Optional: Paraphrase question
-        question = paraphraser.augment(base_question)[0] if augment else base_question
+        # Optional: Paraphrase question (drawn from the precomputed pool)
+        question = rng.choice(pools[base_question]) if augment else base_question
 
         # Base Q&A
         sample = {
             "prompt": f"Question: {question}\nAnswer:",
             "response": base_answer
         }
-        dataset.append(sample)
+        yield sample
 
         # Add follow-up if available
-        if topic in follow_ups and random.random() < 0.3:
-            follow_q = random.choice(follow_ups[topic])
-            follow_a = random.choice(answers[topic])
+        if topic in follow_ups and rng.random() < 0.3:
+            follow_q = rng.choice(follow_ups[topic])
+            follow_a = rng.choice(answers[topic])
             sample_follow = {
                 "prompt": f"Follow-up: {follow_q}\nAnswer:",
                 "response": follow_a
             }
-            dataset.append(sample_follow)
+            yield sample_follow
 
-    return dataset
+def write_dataset(path, num_samples=1000, augment=False, seed=42, dedupe=False,
+                  pool_size=PARAPHRASE_POOL_SIZE, workers=None):
+    """Stream generated samples to a JSONL file.
 
-# Generate and save to file
-dataset = generate_dataset(1000, augment=True)
+    With `dedupe`, repeated prompt/response pairs are skipped, so at most
+    `unique_pair_ceiling()` rows are written no matter how large `num_samples` is.
+    """
+    pools = build_paraphrase_pools(pool_size, seed, workers) if augment else None
+    ceiling = unique_pair_ceiling(pools)
+    print(f"ℹ️ Unique prompt/response pair ceiling: {ceiling}")
+    if dedupe and ceiling < num_samples:
+        print(f"⚠️ dedupe=True caps the output at {ceiling} rows, below the {num_samples} requested samples; "
+              f"increase pool_size or set dedupe=False for larger datasets.")
+    seen = set()
+    written = skipped = 0
 
-with open("enhanced_car_rental_dataset.jsonl", "w", encoding="utf-8") as f:
-    for item in dataset:
-        f.write(json.dumps(item) + "\n")
+    with open(path, "w", encoding="utf-8") as f:
+        for item in generate_dataset(num_samples, augment=augment, seed=seed, pools=pools):
+            if dedupe:
+                key = (item["prompt"], item["response"])
+                if key in seen:
+                    skipped += 1
+                    continue
+                seen.add(key)
+            f.write(json.dumps(item) + "\n")
+            written += 1
 
-print("✅ Generated enhanced_car_rental_dataset.jsonl with augmented Q&A and multi-turn samples.")
+    return written, skipped
+
+# Generate and save to file
+if __name__ == "__main__":
+    written, skipped = write_dataset("enhanced_car_rental_dataset.jsonl", 1000, augment=True, seed=42)
+    print(f"✅ Generated enhanced_car_rental_dataset.jsonl with augmented Q&A and multi-turn samples "
+          f"({written} written, {skipped} duplicates skipped).")
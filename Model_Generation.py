@@ -6,39 +6,63 @@ from transformers import (
     DataCollatorForSeq2Seq,
     EarlyStoppingCallback,
 )
-from datasets import load_dataset
+import json
+import os
 import torch
 
+from training_data import (
+    load_tokenized_splits,
+    padding_stats,
+    sequence_lengths,
+    BucketedSeq2SeqTrainer,
+    TokenBudgetBatchSampler,
+)
+from training_profiler import TrainingProfilerCallback, run_throughput_benchmark
+
 MODEL_NAME = "google/flan-t5-small"  # Try flan-t5-base if needed
+MAX_LENGTH = 128
+BATCH_SIZE = 8  # Examples per training batch in both pipelines, so the optimizer schedule matches
+# Padded source+target tokens per training batch; only batches of long examples hit it and
+# shrink below BATCH_SIZE (a typical pair is ~50 tokens, so 8 of them use ~400)
+MAX_TOKENS_PER_BATCH = 1024
+RUN_THROUGHPUT_BENCHMARK = False  # Set True to benchmark batch size / threads / grad accumulation instead of training
+# Set True to train with the old pipeline (padding to MAX_LENGTH, fixed batch size 8) as a
+# tokens/sec baseline; run once with each setting and the second run prints both numbers
+PAD_TO_MAX_LENGTH = False
+PIPELINE = "max_length" if PAD_TO_MAX_LENGTH else "bucketed"
+OUTPUT_DIR = "./car-rental-finetuned" if not PAD_TO_MAX_LENGTH else "./logs/max-length-baseline"
 
 # Load tokenizer and model
 tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
 model = AutoModelForSeq2SeqLM.from_pretrained(MODEL_NAME)
 
-# Load JSONL dataset and split into train and validation (90/10)
-dataset = load_dataset("json", data_files="car_rental_dataset.jsonl", split="train")
-dataset = dataset.train_test_split(test_size=0.1, seed=42)
-train_dataset = dataset["train"]
-val_dataset = dataset["test"]
-
-# Tokenization function
-def tokenize(batch):
-    model_inputs = tokenizer(batch["prompt"], padding="max_length", truncation=True, max_length=128)
-    with tokenizer.as_target_tokenizer():
-        labels = tokenizer(batch["response"], padding="max_length", truncation=True, max_length=128)
-    model_inputs["labels"] = labels["input_ids"]
-    return model_inputs
+# Load JSONL dataset, split into train and validation (90/10) and tokenize without padding
+# (unless running the baseline). Tokenized splits are cached on disk, keyed by a fingerprint
+# of the data and settings.
+tokenized_train, tokenized_val = load_tokenized_splits(
+    "car_rental_dataset.jsonl", tokenizer,
+    max_source_length=MAX_LENGTH, max_target_length=MAX_LENGTH,
+    test_size=0.1, seed=42, pad_to_max_length=PAD_TO_MAX_LENGTH,
+)
 
-# Tokenize both train and validation sets
-tokenized_train = train_dataset.map(tokenize, batched=True, remove_columns=["prompt", "response"])
-tokenized_val = val_dataset.map(tokenize, batched=True, remove_columns=["prompt", "response"])
+# Compare padded-token cost of fixed max_length padding with length-bucketed batches
+# (lengths are only meaningful for unpadded splits)
+if not PAD_TO_MAX_LENGTH:
+    real_tokens, fixed_tokens = padding_stats(tokenized_train, pad_to=MAX_LENGTH)
+    bucketed_batches = TokenBudgetBatchSampler(sequence_lengths(tokenized_train), max_tokens=MAX_TOKENS_PER_BATCH,
+                                               max_batch_size=BATCH_SIZE).batches
+    _, bucketed_tokens = padding_stats(tokenized_train, batches=bucketed_batches)
+    print(f"📊 Real tokens per epoch: {real_tokens}")
+    print(f"   Fixed padding (max_length={MAX_LENGTH}): {fixed_tokens} tokens ({real_tokens / fixed_tokens:.1%} useful)")
+    print(f"   Bucketed dynamic padding: {bucketed_tokens} tokens ({real_tokens / bucketed_tokens:.1%} useful), "
+          f"{len(tokenized_train) / len(bucketed_batches):.2f} examples per batch on average")
 
 # Training arguments
 training_args = Seq2SeqTrainingArguments(
-    output_dir="./car-rental-finetuned",
+    output_dir=OUTPUT_DIR,
     overwrite_output_dir=True,
     evaluation_strategy="epoch",  # Evaluate every epoch
-    per_device_train_batch_size=8,
+    per_device_train_batch_size=BATCH_SIZE,  # Bucketed batches are capped at this and MAX_TOKENS_PER_BATCH
     per_device_eval_batch_size=8,
     num_train_epochs=10,  # Increase to allow early stopping to work
     save_strategy="epoch",
@@ -48,30 +72,90 @@ training_args = Seq2SeqTrainingArguments(
     save_total_limit=2,
     report_to="none",
     gradient_accumulation_steps=1,
+    dataloader_num_workers=0,  # Collation is cheap; extra workers only add overhead on CPU
     load_best_model_at_end=True,
     metric_for_best_model="eval_loss",
     greater_is_better=False,
 )
 
-# Data collator
-data_collator = DataCollatorForSeq2Seq(tokenizer, model=model)
+# Profiler callback: step time, data-loading stalls, tokens/sec and peak RSS per logging step.
+# Pass profile_steps=(start, end) to also capture a short torch.profiler window.
+# Tokens/sec counts only real tokens (pad ids excluded), so both pipelines are comparable.
+profiler_callback = TrainingProfilerCallback(output_dir=f"./logs/profile/{PIPELINE}",
+                                             pad_token_id=tokenizer.pad_token_id)
+
+# Data collator (wrapped so the profiler can count real tokens per batch)
+data_collator = profiler_callback.wrap_collator(DataCollatorForSeq2Seq(tokenizer, model=model))
 
-# Define trainer with early stopping callback
-trainer = Seq2SeqTrainer(
+if RUN_THROUGHPUT_BENCHMARK:
+    # Fixed-step runs on a fresh model for each setting; batch size caps examples per bucketed batch
+    def make_benchmark_trainer(batch_size, grad_accum, max_steps, callback):
+        bench_model = AutoModelForSeq2SeqLM.from_pretrained(MODEL_NAME)
+        bench_args = Seq2SeqTrainingArguments(
+            output_dir="./logs/benchmark/tmp",
+            max_steps=max_steps,
+            gradient_accumulation_steps=grad_accum,
+            logging_steps=5,
+            save_strategy="no",
+            evaluation_strategy="no",
+            report_to="none",
+            dataloader_num_workers=0,
+        )
+        return BucketedSeq2SeqTrainer(
+            model=bench_model,
+            max_tokens_per_batch=batch_size * MAX_LENGTH * 2,
+            max_batch_size=batch_size,
+            args=bench_args,
+            train_dataset=tokenized_train,
+            tokenizer=tokenizer,
+            data_collator=callback.wrap_collator(DataCollatorForSeq2Seq(tokenizer, model=bench_model)),
+            callbacks=[callback],
+        )
+
+    run_throughput_benchmark(make_benchmark_trainer, batch_sizes=(8, 16, 32),
+                             thread_counts=(1, 2, 4), grad_accum_steps=(1, 2), max_steps=20)
+    raise SystemExit(0)
+
+# Define trainer with early stopping callback and token-budget length bucketing
+# (the baseline uses the stock trainer with fixed-size batches)
+if PAD_TO_MAX_LENGTH:
+    trainer_cls, trainer_kwargs = Seq2SeqTrainer, {}
+else:
+    trainer_cls, trainer_kwargs = BucketedSeq2SeqTrainer, {"max_tokens_per_batch": MAX_TOKENS_PER_BATCH,
+                                                           "max_batch_size": BATCH_SIZE}
+
+trainer = trainer_cls(
     model=model,
+    **trainer_kwargs,
     args=training_args,
     train_dataset=tokenized_train,
     eval_dataset=tokenized_val,
     tokenizer=tokenizer,
     data_collator=data_collator,
-    callbacks=[EarlyStoppingCallback(early_stopping_patience=2)],  # Stop if no improvement for 2 evals
+    callbacks=[
+        EarlyStoppingCallback(early_stopping_patience=2),  # Stop if no improvement for 2 evals
+        profiler_callback,
+    ],
 )
 
 # Train the model
 trainer.train()
 
+# Real tokens/sec for both pipelines, from the profiler reports of this and any earlier run;
+# both use BATCH_SIZE, and the average batch size shows how close the comparison is matched
+print("⚡ Training throughput (real tokens/sec):")
+for pipeline_name in ("max_length", "bucketed"):
+    report_path = f"./logs/profile/{pipeline_name}/training_profile.json"
+    if os.path.exists(report_path):
+        with open(report_path, "r", encoding="utf-8") as f:
+            summary = json.load(f)["summary"]
+        print(f"   {pipeline_name}: {summary['tokens_per_sec']:.0f} "
+              f"({summary['avg_batch_size']:.2f} examples per batch)")
+    else:
+        print(f"   {pipeline_name}: not measured yet (set PAD_TO_MAX_LENGTH={pipeline_name == 'max_length'})")
+
 # Save the final model
-trainer.save_model("./car-rental-finetuned")
-tokenizer.save_pretrained("./car-rental-finetuned")
+trainer.save_model(OUTPUT_DIR)
+tokenizer.save_pretrained(OUTPUT_DIR)
 
-print("✅ Fine-tuning complete with evaluation and early stopping. Model saved to ./car-rental-finetuned")
+print(f"✅ Fine-tuning complete with evaluation and early stopping. Model saved to {OUTPUT_DIR}")
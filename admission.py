@@ -0,0 +1,168 @@
+import asyncio
+import math
+from collections import deque
+from contextlib import asynccontextmanager
+
+
+class Overloaded(Exception):
+    """Raised when a request is shed; `retry_after` is a suggested wait in seconds."""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class ClientDisconnected(Exception):
+    """Raised when a queued request's client went away before it was admitted."""
+
+
+class AdmissionController:
+    """Limit in-flight work, queue a bounded number of requests with a deadline, shed the rest.
+
+    The in-flight limit adapts to measured latency (AIMD): it grows by about one
+    per `limit` completions while latency stays within `latency_tolerance` times
+    the best recent latency, and shrinks by `backoff` when latency rises above
+    that, so throughput stays near peak instead of piling up behind slow work.
+
+    Only requests that did the expensive work should feed latency samples:
+    `slot()` yields a dict, and the caller sets `sample["latency"]` when it
+    ran that work. Requests that finish early release their slot without a
+    sample, so fast rejects cannot drag the baseline down.
+    """
+
+    def __init__(self, initial_limit=4, min_limit=1, max_limit=16, max_queue=32,
+                 queue_timeout=10.0, latency_tolerance=2.0, backoff=0.9,
+                 disconnect_poll_interval=0.5):
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.latency_tolerance = latency_tolerance
+        self.backoff = backoff
+        self.disconnect_poll_interval = disconnect_poll_interval
+
+        self.in_flight = 0
+        self._waiters = deque()
+        self.latency_ewma = None
+        self.min_latency = None
+
+        self.metrics = {
+            "admitted": 0,
+            "admitted_after_queue": 0,
+            "queued": 0,
+            "shed_queue_full": 0,
+            "shed_queue_timeout": 0,
+            "dropped_disconnected": 0,
+            "completed": 0,
+            "latency_samples": 0,
+        }
+
+    def _retry_after(self):
+        """Rough time until a new request could start: queued work divided by concurrency."""
+        latency = self.latency_ewma or 1.0
+        return max(1, math.ceil(latency * (len(self._waiters) + 1) / max(self.limit, 1)))
+
+    def _wake_waiters(self):
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if waiter.done():
+                continue
+            # Hand the slot over directly so new arrivals can't jump the queue
+            self.in_flight += 1
+            waiter.set_result(True)
+
+    def check_queue(self):
+        """Raise Overloaded if a request arriving now would be shed for a full queue.
+
+        Takes no slot, so it can run before the request body is read.
+        """
+        if len(self._waiters) >= self.max_queue:
+            self.metrics["shed_queue_full"] += 1
+            raise Overloaded("queue full", self._retry_after())
+
+    async def acquire(self, request=None):
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            self.metrics["admitted"] += 1
+            return
+
+        self.check_queue()
+
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        self._waiters.append(waiter)
+        self.metrics["queued"] += 1
+        deadline = loop.time() + self.queue_timeout
+
+        try:
+            while True:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    self.metrics["shed_queue_timeout"] += 1
+                    raise Overloaded("queue timeout", self._retry_after())
+                try:
+                    await asyncio.wait_for(asyncio.shield(waiter),
+                                           timeout=min(remaining, self.disconnect_poll_interval))
+                except asyncio.TimeoutError:
+                    if request is not None and await request.is_disconnected():
+                        self.metrics["dropped_disconnected"] += 1
+                        raise ClientDisconnected()
+                if waiter.done():
+                    self.metrics["admitted"] += 1
+                    self.metrics["admitted_after_queue"] += 1
+                    return
+        except BaseException:
+            if waiter.done() and not waiter.cancelled():
+                # A slot was handed to us just as we gave up; pass it on
+                self.in_flight -= 1
+                self._wake_waiters()
+            else:
+                waiter.cancel()
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+            raise
+
+    def release(self, latency=None):
+        self.in_flight -= 1
+        self.metrics["completed"] += 1
+        if latency is not None:
+            self.metrics["latency_samples"] += 1
+            self._update_limit(latency)
+        self._wake_waiters()
+
+    def _update_limit(self, latency):
+        self.latency_ewma = latency if self.latency_ewma is None else 0.8 * self.latency_ewma + 0.2 * latency
+        # Slowly forget the best latency so the baseline can follow real changes
+        self.min_latency = latency if self.min_latency is None else min(latency, self.min_latency * 1.01)
+
+        if self.latency_ewma > self.min_latency * self.latency_tolerance:
+            self.limit = max(self.min_limit, self.limit * self.backoff)
+        else:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    @asynccontextmanager
+    async def slot(self, request=None):
+        """`async with controller.slot(request) as sample:` runs the body once admitted.
+
+        Set `sample["latency"]` (seconds) inside the body to feed the limit.
+        """
+        await self.acquire(request)
+        sample = {"latency": None}
+        try:
+            yield sample
+        finally:
+            self.release(sample["latency"])
+
+    def report(self):
+        return {
+            **self.metrics,
+            "in_flight": self.in_flight,
+            "queue_depth": len(self._waiters),
+            "limit": int(self.limit),
+            "latency_ewma_s": self.latency_ewma,
+            "min_latency_s": self.min_latency,
+        }
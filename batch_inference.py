@@ -0,0 +1,109 @@
+import argparse
+import json
+import os
+import time
+
+import torch
+
+from model_backends import BACKENDS, generate, load_model
+
+
+def load_prompts(path):
+    """Read prompts from a JSONL file (a "prompt" field per line) or a plain text file (one per line)."""
+    prompts = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if path.endswith(".jsonl"):
+                prompts.append(json.loads(line)["prompt"])
+            else:
+                prompts.append(line)
+    return prompts
+
+
+def load_completed_ids(output_path):
+    """Ids already written to the output file, so an interrupted run can resume."""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+
+    # Drop a partially written last line so appended results start on a fresh line
+    with open(output_path, "rb+") as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                done.add(json.loads(line)["id"])
+            except (ValueError, KeyError):
+                continue
+    return done
+
+
+def make_batches(items, tokenizer, batch_size):
+    """Sort (id, prompt) pairs by token length and split them into batches of similar length."""
+    lengths = [len(ids) for ids in tokenizer([p for _, p in items], truncation=True)["input_ids"]]
+    ordered = [item for _, item in sorted(zip(lengths, items), key=lambda x: x[0])]
+    return [ordered[i:i + batch_size] for i in range(0, len(ordered), batch_size)]
+
+
+def run_batch_inference(input_path, output_path, model_path=None, backend="fp32", batch_size=32,
+                        num_threads=None, max_input_length=128):
+    if num_threads:
+        torch.set_num_threads(num_threads)
+
+    tokenizer, model = load_model(backend, model_path)
+
+    prompts = load_prompts(input_path)
+    done = load_completed_ids(output_path)
+    pending = [(idx, p) for idx, p in enumerate(prompts) if idx not in done]
+    if done:
+        print(f"↩️ Resuming: {len(done)} prompt(s) already done, {len(pending)} remaining")
+
+    batches = make_batches(pending, tokenizer, batch_size) if pending else []
+    latencies = []
+    start = time.perf_counter()
+
+    with open(output_path, "a", encoding="utf-8") as out:
+        for batch_num, batch in enumerate(batches, start=1):
+            batch_start = time.perf_counter()
+            responses = generate(tokenizer, model, [p for _, p in batch], max_input_length)
+
+            # Stream each finished batch so an interruption loses at most one batch
+            for (idx, prompt), response in zip(batch, responses):
+                out.write(json.dumps({"id": idx, "prompt": prompt, "response": response}) + "\n")
+            out.flush()
+
+            latency = time.perf_counter() - batch_start
+            latencies.append(latency)
+            print(f"🔹 Batch {batch_num}/{len(batches)}: {len(batch)} prompt(s) in {latency:.3f}s "
+                  f"({len(batch) / latency:.1f} prompts/sec)")
+
+    elapsed = time.perf_counter() - start
+    if latencies:
+        ordered = sorted(latencies)
+        print(f"✅ {len(pending)} prompt(s) in {elapsed:.2f}s: {len(pending) / elapsed:.1f} prompts/sec, "
+              f"batch latency mean {sum(latencies) / len(latencies):.3f}s, "
+              f"p50 {ordered[len(ordered) // 2]:.3f}s, max {ordered[-1]:.3f}s")
+    else:
+        print("✅ Nothing to do: all prompts already have results.")
+    print(f"   Results saved to '{output_path}'")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batched inference with the fine-tuned car rental model.")
+    parser.add_argument("input", help="Prompts file (.jsonl with a 'prompt' field, or .txt with one prompt per line)")
+    parser.add_argument("output", help="JSONL file to stream results to (appended to when resuming)")
+    parser.add_argument("--backend", choices=BACKENDS, default="fp32",
+                        help="fp32, int8 or onnx (see model_backends.py to build the artifacts)")
+    parser.add_argument("--model-path", default=None, help="Override the backend's default model directory")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--threads", type=int, default=None, help="torch intra-op threads (default: torch's choice)")
+    args = parser.parse_args()
+
+    run_batch_inference(args.input, args.output, model_path=args.model_path, backend=args.backend,
+                        batch_size=args.batch_size, num_threads=args.threads)
@@ -0,0 +1,101 @@
+import argparse
+import json
+import multiprocessing as mp
+import time
+from difflib import SequenceMatcher
+
+from test_finetuned_model import prompts
+
+
+def current_rss_mb():
+    """Current resident set size of this process in MB (Linux)."""
+    with open("/proc/self/status", "r") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def _benchmark_backend(backend, num_threads, batch_size, repeats):
+    """Run in a fresh process so load memory and peak RSS are measured per backend."""
+    import resource
+    import torch
+    from model_backends import generate, load_model
+
+    torch.set_num_threads(num_threads)
+    rss_before = current_rss_mb()
+    load_start = time.perf_counter()
+    tokenizer, model = load_model(backend)
+    load_time = time.perf_counter() - load_start
+    rss_loaded = current_rss_mb()
+
+    generate(tokenizer, model, prompts[:1])  # Warm-up
+
+    # Single-prompt latency
+    latencies, outputs = [], []
+    for _ in range(repeats):
+        outputs = []
+        for prompt in prompts:
+            start = time.perf_counter()
+            outputs.extend(generate(tokenizer, model, [prompt]))
+            latencies.append(time.perf_counter() - start)
+
+    # Batched throughput
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for i in range(0, len(prompts), batch_size):
+            generate(tokenizer, model, prompts[i:i + batch_size])
+    batched_time = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "backend": backend,
+        "load_time_s": load_time,
+        "model_rss_mb": rss_loaded - rss_before,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "latency_mean_ms": 1000 * sum(latencies) / len(latencies),
+        "latency_p50_ms": 1000 * latencies[len(latencies) // 2],
+        "latency_p95_ms": 1000 * latencies[int(len(latencies) * 0.95)],
+        "throughput_prompts_per_sec": repeats * len(prompts) / batched_time,
+        "outputs": outputs,
+    }
+
+
+def compare_backends(backends=("fp32", "int8", "onnx"), num_threads=4, batch_size=8, repeats=3):
+    ctx = mp.get_context("spawn")
+    results = []
+    for backend in backends:
+        with ctx.Pool(1) as pool:
+            try:
+                results.append(pool.apply(_benchmark_backend, (backend, num_threads, batch_size, repeats)))
+            except (ImportError, FileNotFoundError) as e:
+                print(f"⚠️ Skipping {backend}: {e}")
+
+    reference = next((r["outputs"] for r in results if r["backend"] == "fp32"), None)
+    for r in results:
+        if reference is not None:
+            r["exact_match_vs_fp32"] = sum(a == b for a, b in zip(r["outputs"], reference)) / len(reference)
+            r["similarity_vs_fp32"] = sum(SequenceMatcher(None, a, b).ratio()
+                                          for a, b in zip(r["outputs"], reference)) / len(reference)
+
+        print(f"\n🔹 {r['backend']}")
+        for key, value in r.items():
+            if key not in ("backend", "outputs"):
+                print(f"   {key}: {value:.3f}")
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare fp32, int8 and ONNX backends on the test prompts.")
+    parser.add_argument("--backends", nargs="+", default=["fp32", "int8", "onnx"])
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", default="backend_benchmark.json")
+    args = parser.parse_args()
+
+    results = compare_backends(args.backends, args.threads, args.batch_size, args.repeats)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"\n✅ Benchmark saved to '{args.output}'")
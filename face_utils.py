@@ -1,6 +1,7 @@
 import cv2
 import numpy as np
 import os
+import threading
 
 class ImageQualityInspector:
     def __init__(self, 
@@ -9,13 +10,20 @@ class ImageQualityInspector:
                  blur_threshold=100.0, 
                  debug=False):
         """Initialize the Inspector with thresholds and settings."""
-        self.face_cascade = cv2.CascadeClassifier(
-            face_cascade_path or (cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
-        )
+        self.face_cascade_path = face_cascade_path or (cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
+        self._local = threading.local()
         self.face_region_threshold = face_region_threshold
         self.blur_threshold = blur_threshold
         self.debug = debug
 
+    @property
+    def face_cascade(self):
+        """Per-thread CascadeClassifier: OpenCV does not document it as thread-safe."""
+        cascade = getattr(self._local, "face_cascade", None)
+        if cascade is None:
+            cascade = self._local.face_cascade = cv2.CascadeClassifier(self.face_cascade_path)
+        return cascade
+
     def _load_image(self, image_path):
         """Load an image from a file path and handle errors."""
         if not os.path.exists(image_path):
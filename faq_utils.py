@@ -0,0 +1,268 @@
+import importlib.util
+import json
+import os
+import re
+import string
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from scipy.sparse import vstack
+from sklearn.feature_extraction.text import HashingVectorizer
+
+# Model backend used on cache misses: fp32, int8 or onnx (see model_backends.py)
+MODEL_BACKEND = os.environ.get("FAQ_MODEL_BACKEND", "fp32")
+# Optional known question/answer pairs, e.g. the output of
+# `python batch_inference.py questions.txt faq_seed.jsonl`; when the file is missing the
+# cache is seeded with the dataset generator's own questions and answers
+FAQ_SEED_PATH = "faq_seed.jsonl"
+GENERATOR_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Dataset Generation + Formatting.py")
+
+# Words that carry no meaning for matching. Negations and prepositions like
+# "with"/"without" are deliberately kept: they flip the answer.
+STOPWORDS = {
+    "a", "an", "the", "i", "me", "my", "you", "your", "we", "our", "it", "its", "is", "are", "am",
+    "be", "do", "does", "did", "can", "could", "will", "would", "should", "have", "has", "there",
+    "any", "to", "for", "of", "in", "on", "at", "what", "how", "if", "this", "that", "please",
+}
+
+# Domain synonyms mapped to one canonical word before comparing keywords
+SYNONYMS = {
+    "need": "require", "needed": "require", "required": "require", "requirement": "require",
+    "booking": "reservation", "book": "reserve", "another": "different",
+    "vehicle": "car", "vehicles": "car", "automobile": "car", "auto": "car", "cars": "car",
+    "cost": "price", "costs": "price", "fee": "charge", "fees": "charge", "charges": "charge",
+}
+
+
+def normalize_question(text):
+    """Lowercase, strip punctuation and collapse whitespace for exact-match lookups."""
+    text = text.lower().strip().translate(str.maketrans('', '', string.punctuation))
+    return re.sub(r"\s+", " ", text)
+
+
+def _stem(word):
+    word = SYNONYMS.get(word, word)
+    for suffix in ("ing", "ed", "es", "s", "e"):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)]
+    return word
+
+
+def content_words(normalized):
+    """Stemmed, synonym-folded words of a normalized question, minus stopwords."""
+    return {_stem(w) for w in normalized.split() if w not in STOPWORDS}
+
+
+def canonical_text(normalized):
+    """Sorted content words; what the similarity index embeds."""
+    return " ".join(sorted(content_words(normalized)))
+
+
+# Words every question in this domain can carry without changing its answer
+# ("cancel my car reservation online"); a query may add a few of these
+LOW_INFO_WORDS = {_stem(w) for w in ("car", "rental", "rent", "online")}
+MAX_EXTRA_QUERY_WORDS = 2
+
+
+def keywords_agree(query_words, candidate_words):
+    """A similarity hit must mention everything the query asks about.
+
+    Every query keyword has to appear in the candidate, except up to
+    `MAX_EXTRA_QUERY_WORDS` from `LOW_INFO_WORDS`, and the candidate may add
+    at most one qualifier. Questions that differ in a single keyword ("GPS"
+    vs "fuel", "with" vs "without") score high on character n-grams but need
+    different answers, so they fall through to the model.
+    """
+    extra_query_words = query_words - candidate_words
+    return (extra_query_words <= LOW_INFO_WORDS
+            and len(extra_query_words) <= MAX_EXTRA_QUERY_WORDS
+            and len(candidate_words - query_words) <= 1)
+
+
+def load_generator_questions(path=GENERATOR_PATH):
+    """(question, answer) pairs from the dataset generator's `topics` and `follow_ups`."""
+    spec = importlib.util.spec_from_file_location("dataset_generator", path)
+    generator = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(generator)  # Safe: the generator only runs under __main__
+
+    pairs = []
+    for topic, questions in list(generator.topics.items()) + list(generator.follow_ups.items()):
+        pairs.extend((question, generator.answers[topic][0]) for question in questions)
+    return pairs
+
+
+class TierStats:
+    """Hit count and cumulative latency for one lookup tier."""
+
+    def __init__(self):
+        self.hits = 0
+        self.total_latency = 0.0
+
+    def record(self, latency):
+        self.hits += 1
+        self.total_latency += latency
+
+    def as_dict(self, total_requests):
+        return {
+            "hits": self.hits,
+            "hit_rate": self.hits / total_requests if total_requests else 0.0,
+            "avg_latency_ms": 1000 * self.total_latency / self.hits if self.hits else 0.0,
+        }
+
+
+class FAQAnswerCache:
+    """Answer questions from an exact-match LRU cache, then a similarity index, then the model.
+
+    The similarity index embeds each question's content words (`canonical_text`:
+    synonyms folded, stopwords dropped) with a hashing vectorizer (character
+    n-grams within word boundaries, L2-normalized), so cosine similarity is a
+    dot product and new questions can be added without refitting. A similarity
+    hit must also pass `keywords_agree`; n-gram similarity alone ranks
+    one-word substitutions as high as true paraphrases.
+
+    The 0.6 threshold was calibrated on paraphrase and near-miss pairs built
+    from the generator's questions (see test_faq_utils.py). With the keyword
+    check in place, paraphrases score 0.76-1.0 and no near-miss gets through.
+    Similarity hits are not copied into the exact tier, so every repeat is
+    checked again.
+    """
+
+    # Index rows are stacked into fixed-size blocks so adding a question never
+    # rebuilds the whole matrix
+    BLOCK_ROWS = 256
+
+    def __init__(self, generate_fn, exact_capacity=10000, similarity_threshold=0.6,
+                 max_index_size=50000):
+        self.generate_fn = generate_fn
+        self.exact_capacity = exact_capacity
+        self.similarity_threshold = similarity_threshold
+        self.max_index_size = max_index_size
+
+        self.exact = OrderedDict()
+        self.vectorizer = HashingVectorizer(analyzer="char_wb", ngram_range=(2, 4),
+                                            n_features=2 ** 18, alternate_sign=False, norm="l2")
+        self.index_questions = []
+        self.index_answers = []
+        self.index_words = []
+        self._index_blocks = []
+        self._pending_rows = []
+
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.stats = {"exact": TierStats(), "semantic": TierStats(), "model": TierStats()}
+
+    def _embed(self, keys):
+        return self.vectorizer.transform([canonical_text(key) for key in keys])
+
+    def _remember(self, key, answer, vector):
+        self.exact[key] = answer
+        self.exact.move_to_end(key)
+        if len(self.exact) > self.exact_capacity:
+            self.exact.popitem(last=False)
+
+        if len(self.index_questions) < self.max_index_size:
+            self.index_questions.append(key)
+            self.index_answers.append(answer)
+            self.index_words.append(content_words(key))
+            self._pending_rows.append(vector)
+            if len(self._pending_rows) >= self.BLOCK_ROWS:
+                self._index_blocks.append(vstack(self._pending_rows).tocsr())
+                self._pending_rows = []
+
+    def add_known(self, question, answer):
+        """Add a known question/answer pair (e.g. from the seed file) to both tiers."""
+        key = normalize_question(question)
+        with self.lock:
+            if key not in self.exact:
+                self._remember(key, answer, self._embed([key]))
+
+    def load_seed_file(self, path=FAQ_SEED_PATH):
+        """Seed from `path` if it exists, otherwise from the dataset generator's questions."""
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                items = [json.loads(line) for line in f if line.strip()]
+            pairs = [(item["prompt"], item["response"]) for item in items]
+        else:
+            pairs = load_generator_questions()
+        for question, answer in pairs:
+            self.add_known(question, answer)
+        return len(pairs)
+
+    def _nearest(self, vector, query_words):
+        """Best-scoring indexed question whose keywords agree with the query."""
+        blocks = self._index_blocks + ([vstack(self._pending_rows)] if self._pending_rows else [])
+        if not blocks:
+            return None, 0.0
+        scores = np.concatenate([(block @ vector.T).toarray().ravel() for block in blocks])
+        # Check keywords on the few best candidates instead of the whole index
+        for idx in np.argsort(-scores)[:10]:
+            if scores[idx] < self.similarity_threshold:
+                break
+            if keywords_agree(query_words, self.index_words[idx]):
+                return int(idx), float(scores[idx])
+        return None, float(scores.max())
+
+    def ask(self, question):
+        """Return (answer, source, similarity) where source is 'exact', 'semantic' or 'model'."""
+        start = time.perf_counter()
+        key = normalize_question(question)
+
+        with self.lock:
+            self.requests += 1
+            answer = self.exact.get(key)
+            if answer is not None:
+                self.exact.move_to_end(key)
+                self.stats["exact"].record(time.perf_counter() - start)
+                return answer, "exact", 1.0
+
+        vector = self._embed([key])
+        with self.lock:
+            best, score = self._nearest(vector, content_words(key))
+            if best is not None:
+                self.stats["semantic"].record(time.perf_counter() - start)
+                return self.index_answers[best], "semantic", score
+
+        # Generate outside the lock so cache hits are not blocked by slow model calls
+        answer = self.generate_fn(question)
+        with self.lock:
+            self._remember(key, answer, vector)
+            self.stats["model"].record(time.perf_counter() - start)
+        return answer, "model", score
+
+    def report(self):
+        with self.lock:
+            return {
+                "requests": self.requests,
+                "exact_cache_size": len(self.exact),
+                "index_size": len(self.index_questions),
+                "similarity_threshold": self.similarity_threshold,
+                "tiers": {name: s.as_dict(self.requests) for name, s in self.stats.items()},
+            }
+
+
+_model = None
+_model_lock = threading.Lock()
+
+
+def get_model(backend=MODEL_BACKEND):
+    """Load the fine-tuned model (tokenizer, model) once per process, on first use."""
+    global _model
+    with _model_lock:
+        if _model is None:
+            from app.model_backends import load_model
+            _model = load_model(backend)
+        return _model
+
+
+def generate_answer(question):
+    """Full T5 generation; only called on a cache miss."""
+    from app.model_backends import generate
+
+    tokenizer, model = get_model()
+    return generate(tokenizer, model, [question])[0]
+
+
+faq_cache = FAQAnswerCache(generate_answer)
+faq_cache.load_seed_file()
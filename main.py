@@ -1,23 +1,114 @@
-from fastapi import FastAPI, UploadFile, File
+from fastapi import FastAPI, UploadFile, File, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response
 from fastapi.staticfiles import StaticFiles
-from app.ocr_utils import extract_text, validate_license_fields
+from app.ocr_utils import extract_text, validate_license_fields, ocr_weights_info
 from app.preprocessing import preprocess_image
 import shutil
 import os
+import time
 import uuid
+import torch
 
 from app.face_utils import ImageQualityInspector  # <-- Updated import!
+from app.faq_utils import faq_cache
+from app.model_backends import memory_report
+from app.admission import AdmissionController, Overloaded, ClientDisconnected
+from pydantic import BaseModel
 
 app = FastAPI()
 
 # Initialize the smart inspector (you can adjust thresholds if needed)
 inspector = ImageQualityInspector(debug=False)
 
+# Admission control for /analyze-id: bounded in-flight OCR work and wait queue,
+# with the in-flight limit adapting to measured OCR latency.
+# Thread-safety assumptions for the threadpool-run pipeline:
+# - each thread gets its own Haar cascade (ImageQualityInspector keeps them thread-local);
+# - the shared EasyOCR reader only runs inference, which does not mutate model state;
+# - in-flight analyses are capped at the core count and each OCR call splits the cores
+#   with the others in flight (see ocr_thread_count), so concurrent OCR calls don't
+#   oversubscribe the CPU.
+CPU_COUNT = os.cpu_count() or 1
+DEFAULT_TORCH_THREADS = torch.get_num_threads()
+admission = AdmissionController(initial_limit=min(4, CPU_COUNT), min_limit=1, max_limit=CPU_COUNT,
+                                max_queue=32, queue_timeout=10.0)
+
 # Mount images directory for static access
 app.mount("/images", StaticFiles(directory="images"), name="images")
 
+class Question(BaseModel):
+    question: str
+
+# Defined as a sync route so FastAPI runs model generation in its threadpool
+@app.post("/ask")
+def ask(payload: Question):
+    answer, source, similarity = faq_cache.ask(payload.question)
+    return {
+        "question": payload.question,
+        "answer": answer,
+        "source": source,  # "exact", "semantic" or "model"
+        "similarity": round(similarity, 4)
+    }
+
+@app.get("/ask/stats")
+def ask_stats():
+    return faq_cache.report()
+
+# Per-worker memory: compare pss_mb (shared pages split across workers) with rss_mb
+@app.get("/memory")
+def memory():
+    return {**memory_report(), **ocr_weights_info()}
+
+@app.get("/analyze-id/stats")
+def analyze_id_stats():
+    return admission.report()
+
+def overloaded_response(e):
+    return JSONResponse(
+        status_code=503,
+        headers={"Retry-After": str(e.retry_after)},
+        content={"status": "rejected", "message": f"Server busy ({e.reason}), please retry later."}
+    )
+
+# FastAPI reads the whole multipart body before the endpoint runs, so shed a full
+# queue here, before the upload is read
+@app.middleware("http")
+async def shed_analyze_id_early(request: Request, call_next):
+    if request.method == "POST" and request.url.path == "/analyze-id":
+        try:
+            admission.check_queue()
+        except Overloaded as e:
+            return overloaded_response(e)
+    return await call_next(request)
+
 @app.post("/analyze-id")
-async def analyze_id(image: UploadFile = File(...)):
+async def analyze_id(request: Request, image: UploadFile = File(...)):
+    """Queue for an OCR slot, then analyze the uploaded ID image.
+
+    Requests are shed with a 503 before the upload is read only when the queue
+    is already full (see shed_analyze_id_early). Queue-timeout sheds and
+    disconnect checks happen here, after FastAPI has read the whole file.
+    """
+    # Shed or queue before doing any work, so rejected uploads are never written to images/
+    try:
+        async with admission.slot(request) as sample:
+            return await run_in_threadpool(process_id_image, image.file, sample)
+    except Overloaded as e:
+        return overloaded_response(e)
+    except ClientDisconnected:
+        return Response(status_code=499)  # Client closed request; nobody will read the response
+
+def ocr_thread_count():
+    """Intra-op torch threads for one OCR call: the cores split between the analyses in flight."""
+    return max(1, CPU_COUNT // max(1, admission.in_flight))
+
+def process_id_image(image_file, sample):
+    """Save the upload and run face/blur checks, OCR and validation (blocking; runs in a worker thread).
+
+    Records OCR time in `sample["latency"]` for admission control; fast face/blur
+    rejects leave it unset.
+    """
     # Save uploaded image
     unique_filename = f"{uuid.uuid4()}.jpg"
     image_dir = "images"
@@ -25,7 +116,7 @@ async def analyze_id(image: UploadFile = File(...)):
     image_path = os.path.join(image_dir, unique_filename)
 
     with open(image_path, "wb") as buffer:
-        shutil.copyfileobj(image.file, buffer)
+        shutil.copyfileobj(image_file, buffer)
 
     # Step 1: Face detection + Blur detection (with smart inspector)
     results = inspector.evaluate_image(image_path)
@@ -49,8 +140,16 @@ async def analyze_id(image: UploadFile = File(...)):
 
     # Step 2: OCR + Validation
     try:
-        preprocessed_path = preprocess_image(image_path)
-        extracted_text = extract_text(preprocessed_path)
+        # Sized for this OCR call only and restored afterwards, so /ask generation on the
+        # same threadpool keeps torch's default thread count
+        torch.set_num_threads(ocr_thread_count())
+        try:
+            ocr_start = time.perf_counter()
+            preprocessed_path = preprocess_image(image_path)
+            extracted_text = extract_text(preprocessed_path)
+            sample["latency"] = time.perf_counter() - ocr_start
+        finally:
+            torch.set_num_threads(DEFAULT_TORCH_THREADS)
         is_valid, fields = validate_license_fields(extracted_text)
 
         return {
@@ -0,0 +1,187 @@
+import argparse
+import json
+import os
+import struct
+
+import numpy as np
+import torch
+from transformers import AutoConfig, AutoTokenizer, AutoModelForSeq2SeqLM
+
+MODEL_PATH = "./car-rental-finetuned"
+INT8_PATH = "./car-rental-finetuned-int8"
+ONNX_PATH = "./car-rental-finetuned-onnx"
+INT8_WEIGHTS = "quantized_state_dict.pt"
+SAFETENSORS_WEIGHTS = "model.safetensors"
+
+BACKENDS = ("fp32", "int8", "onnx")
+
+# Greedy decoding shared by every inference path, matching test_finetuned_model.py
+GENERATION_KWARGS = {
+    "max_length": 128,
+    "do_sample": False,
+    "num_return_sequences": 1,
+}
+
+# safetensors dtype codes -> numpy dtypes (BF16 is read as int16 and reinterpreted)
+SAFETENSORS_DTYPES = {
+    "F64": np.float64, "F32": np.float32, "F16": np.float16, "BF16": np.int16,
+    "I64": np.int64, "I32": np.int32, "I16": np.int16, "I8": np.int8, "U8": np.uint8, "BOOL": np.bool_,
+}
+
+
+def save_mmap_weights(module, path):
+    """Write a module's weights as safetensors so worker processes can map them with `load_mmap_weights`."""
+    from safetensors.torch import save_model
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    save_model(module, tmp_path)  # Stores tied/shared tensors once
+    os.replace(tmp_path, path)
+
+
+def load_mmap_weights(path):
+    """Map a .safetensors file into tensors backed directly by the file's pages.
+
+    The mapping is copy-on-write: every process that maps the same file shares
+    one copy in the page cache, and a page is only duplicated if it is written.
+    """
+    with open(path, "rb") as f:
+        header_len = struct.unpack("<Q", f.read(8))[0]
+        header = json.loads(f.read(header_len))
+    buffer = np.memmap(path, dtype=np.uint8, mode="c")
+    data_start = 8 + header_len
+
+    tensors = {}
+    for name, info in header.items():
+        if name == "__metadata__":
+            continue
+        begin, end = info["data_offsets"]
+        array = buffer[data_start + begin:data_start + end].view(SAFETENSORS_DTYPES[info["dtype"]])
+        tensor = torch.from_numpy(array)
+        if info["dtype"] == "BF16":
+            tensor = tensor.view(torch.bfloat16)
+        tensors[name] = tensor.reshape(info["shape"])
+    return tensors
+
+
+def attach_mmap_weights(module, path):
+    """Replace a module's parameters with memory-mapped tensors from `path` (inference only).
+
+    Only tied weights may be absent from the file; any other missing key means
+    a partial or stale file and would leave freshly initialized weights behind.
+    """
+    missing, unexpected = module.load_state_dict(load_mmap_weights(path), strict=False, assign=True)
+    if unexpected:
+        raise ValueError(f"Unexpected weights in {path}: {unexpected[:5]}")
+    tied_keys = set(getattr(module, "_tied_weights_keys", None) or [])
+    untied_missing = [key for key in missing if key not in tied_keys]
+    if untied_missing:
+        raise ValueError(f"Missing weights in {path}: {untied_missing[:5]}")
+    # Tied weights (e.g. T5 embed_tokens -> shared) are stored once and re-tied here
+    if hasattr(module, "tie_weights"):
+        module.tie_weights()
+    module.requires_grad_(False)
+    module.eval()
+    return module
+
+
+def memory_report():
+    """Memory of this process in MB. Pss splits shared pages between the processes mapping them."""
+    fields = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty")
+    report = {"pid": os.getpid()}
+    with open("/proc/self/smaps_rollup", "r") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            if key in fields:
+                report[key.lower() + "_mb"] = int(value.split()[0]) / 1024
+    return report
+
+
+def quantize_int8(model_path=MODEL_PATH, output_path=INT8_PATH):
+    """Dynamic int8 quantization of every nn.Linear; activations stay fp32 and are quantized per batch."""
+    model = AutoModelForSeq2SeqLM.from_pretrained(model_path)
+    model.eval()
+    quantized = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+    os.makedirs(output_path, exist_ok=True)
+    torch.save(quantized.state_dict(), os.path.join(output_path, INT8_WEIGHTS))
+    model.config.save_pretrained(output_path)
+    AutoTokenizer.from_pretrained(model_path).save_pretrained(output_path)
+    print(f"✅ Saved int8 model to {output_path}")
+
+
+def export_onnx(model_path=MODEL_PATH, output_path=ONNX_PATH):
+    """Export encoder/decoder graphs to ONNX for onnxruntime (needs `optimum[onnxruntime]`)."""
+    try:
+        from optimum.onnxruntime import ORTModelForSeq2SeqLM
+    except ImportError as e:
+        raise ImportError("ONNX export requires `pip install optimum[onnxruntime]`") from e
+
+    model = ORTModelForSeq2SeqLM.from_pretrained(model_path, export=True)
+    model.save_pretrained(output_path)
+    AutoTokenizer.from_pretrained(model_path).save_pretrained(output_path)
+    print(f"✅ Saved ONNX model to {output_path}")
+
+
+def load_model(backend="fp32", model_path=None, mmap_weights=True):
+    """Return (tokenizer, model) for a backend; every backend's model supports `.generate()`.
+
+    With `mmap_weights`, fp32 weights in model.safetensors are memory-mapped
+    rather than copied, so several server workers share one copy in RAM.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}', expected one of {BACKENDS}")
+    model_path = model_path or {"fp32": MODEL_PATH, "int8": INT8_PATH, "onnx": ONNX_PATH}[backend]
+    if not os.path.exists(model_path):
+        raise FileNotFoundError(f"Model path '{model_path}' not found.")
+
+    tokenizer = AutoTokenizer.from_pretrained(model_path)
+
+    weights_path = os.path.join(model_path, SAFETENSORS_WEIGHTS)
+    if backend == "fp32" and mmap_weights and os.path.exists(weights_path):
+        model = AutoModelForSeq2SeqLM.from_config(AutoConfig.from_pretrained(model_path))
+        return tokenizer, attach_mmap_weights(model, weights_path)
+    elif backend == "fp32":
+        model = AutoModelForSeq2SeqLM.from_pretrained(model_path)
+    elif backend == "int8":
+        # Rebuild the quantized module structure from the config, then load the packed weights
+        model = AutoModelForSeq2SeqLM.from_config(AutoConfig.from_pretrained(model_path))
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        model.load_state_dict(torch.load(os.path.join(model_path, INT8_WEIGHTS)))
+    else:
+        try:
+            from optimum.onnxruntime import ORTModelForSeq2SeqLM
+        except ImportError as e:
+            raise ImportError("The onnx backend requires `pip install optimum[onnxruntime]`") from e
+        return tokenizer, ORTModelForSeq2SeqLM.from_pretrained(model_path)
+
+    model.eval()
+    return tokenizer, model
+
+
+def generate(tokenizer, model, prompts, max_input_length=128):
+    """Generate one response per prompt as a single padded batch, for any backend."""
+    inputs = tokenizer(prompts, return_tensors="pt", padding=True, truncation=True, max_length=max_input_length)
+    with torch.inference_mode():
+        outputs = model.generate(**inputs, **GENERATION_KWARGS)
+    return tokenizer.batch_decode(outputs, skip_special_tokens=True, clean_up_tokenization_spaces=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert the fine-tuned model into optimized CPU artifacts.")
+    parser.add_argument("--model-path", default=MODEL_PATH)
+    parser.add_argument("--int8", action="store_true", help=f"Write a dynamic int8 model to {INT8_PATH}")
+    parser.add_argument("--onnx", action="store_true", help=f"Write an ONNX export to {ONNX_PATH}")
+    parser.add_argument("--safetensors", action="store_true",
+                        help=f"Write {SAFETENSORS_WEIGHTS} into the model directory so workers can memory-map it")
+    args = parser.parse_args()
+
+    if not (args.int8 or args.onnx or args.safetensors):
+        parser.error("choose at least one of --int8 / --onnx / --safetensors")
+    if args.safetensors:
+        AutoModelForSeq2SeqLM.from_pretrained(args.model_path).save_pretrained(args.model_path, safe_serialization=True)
+        print(f"✅ Saved {SAFETENSORS_WEIGHTS} to {args.model_path}")
+    if args.int8:
+        quantize_int8(args.model_path)
+    if args.onnx:
+        export_onnx(args.model_path)
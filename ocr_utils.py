@@ -1,9 +1,49 @@
 import easyocr
+import os
 import re
 from difflib import get_close_matches
 import string
 
-reader = easyocr.Reader(['en'])
+from app.model_backends import attach_mmap_weights, save_mmap_weights
+
+# Memory-mappable copies of the EasyOCR networks, shared by all server workers
+SHARED_WEIGHTS_DIR = "shared_weights"
+DETECTOR_WEIGHTS = os.path.join(SHARED_WEIGHTS_DIR, "easyocr_detector.safetensors")
+RECOGNIZER_WEIGHTS = os.path.join(SHARED_WEIGHTS_DIR, "easyocr_recognizer.safetensors")
+
+# Which weights the reader runs on (reported by /memory):
+# - "shared-mmap": fp32 copies memory-mapped from SHARED_WEIGHTS_DIR, since dynamically
+#   quantized layers hold packed weights that cannot be memory-mapped;
+# - "private": EasyOCR's default int8-quantized reader, loaded per worker.
+reader_weights = None
+reader_precision = None
+
+def load_reader():
+    """Create the EasyOCR reader, memory-mapping fp32 weights when shared copies exist."""
+    global reader_weights, reader_precision
+    if os.path.exists(DETECTOR_WEIGHTS) and os.path.exists(RECOGNIZER_WEIGHTS):
+        ocr_reader = easyocr.Reader(['en'], gpu=False, quantize=False)
+        attach_mmap_weights(ocr_reader.detector, DETECTOR_WEIGHTS)
+        attach_mmap_weights(ocr_reader.recognizer, RECOGNIZER_WEIGHTS)
+        reader_weights, reader_precision = "shared-mmap", "fp32"
+    else:
+        ocr_reader = easyocr.Reader(['en'], gpu=False)
+        reader_weights, reader_precision = "private", "int8"
+    print(f"ℹ️ EasyOCR weights: {reader_weights} ({reader_precision})")
+    return ocr_reader
+
+def ocr_weights_info():
+    return {"ocr_weights": reader_weights, "ocr_precision": reader_precision}
+
+def export_shared_weights():
+    """Write the EasyOCR detector and recognizer weights as safetensors for `load_reader`."""
+    fp32_reader = easyocr.Reader(['en'], gpu=False, quantize=False)
+    save_mmap_weights(fp32_reader.detector, DETECTOR_WEIGHTS)
+    save_mmap_weights(fp32_reader.recognizer, RECOGNIZER_WEIGHTS)
+    print(f"✅ Saved shared EasyOCR weights to {SHARED_WEIGHTS_DIR}/")
+
+# The export command builds its own reader, so skip loading one when run as a script
+reader = load_reader() if __name__ != "__main__" else None
 
 def normalize_text(text):
     """Normalize text by stripping, lowercasing, and removing punctuation."""
@@ -125,3 +165,7 @@ def validate_license_fields(text_lines):
     is_valid = sum(results[k] is not None for k in ["license_number", "dob", "expiry_date", "name"]) >= 3
 
     return is_valid, results
+
+# Run once (python -m app.ocr_utils) before starting multiple workers
+if __name__ == "__main__":
+    export_shared_weights()
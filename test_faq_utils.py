@@ -0,0 +1,91 @@
+import pytest
+
+from faq_utils import FAQAnswerCache, load_generator_questions
+
+KNOWN = load_generator_questions()
+
+# Reworded versions of generator questions that should reuse the known answer
+PARAPHRASES = [
+    ("What documents are needed to rent a car?", "What documents are required to rent a car?"),
+    ("What documents do I need to rent a car?", "What documents are required to rent a car?"),
+    ("Can I cancel my booking?", "Can I cancel my reservation?"),
+    ("Is there any grace period for late returns?", "Is there a grace period for late returns?"),
+    ("How are rental prices calculated?", "How are car rental prices calculated?"),
+    ("Do you have a loyalty program?", "Do you offer a loyalty program?"),
+    ("Is there a deductible for damage?", "Is there a deductible for damages?"),
+    ("What happens if I damaged the car?", "What happens if I damage the car?"),
+    ("Can I return my car to a different location?", "Can I return the car to a different location?"),
+    ("Are electric cars available?", "Are electric vehicles available?"),
+    ("Do you have electric cars?", "Are electric vehicles available?"),
+    ("Can I cancel my car reservation?", "Can I cancel my reservation?"),
+    ("Can I cancel my rental booking?", "Can I cancel my reservation?"),
+    ("Can I return the car to another location?", "Can I return the car to a different location?"),
+    ("What documents do I need to rent a car online?", "What documents are required to rent a car?"),
+]
+
+# Questions that share most of their wording with a known question but need a different answer
+NEAR_MISSES = [
+    "Is GPS included in the rental price?",
+    "Are there extra charges for additional drivers?",
+    "Can I rent a car with a credit card?",
+    "Can a 21-year-old rent a car?",
+    "Do you offer trucks for rent?",
+    "What happens if I return the car early?",
+    "Is it possible to pick up a car at the train station?",
+    "Can I pay for insurance in advance?",
+]
+
+
+@pytest.fixture
+def cache():
+    calls = []
+    faq = FAQAnswerCache(lambda question: calls.append(question) or "generated")
+    for question, answer in KNOWN:
+        faq.add_known(question, answer)
+    faq.model_calls = calls
+    return faq
+
+
+def known_answer(question):
+    return dict(KNOWN)[question]
+
+
+@pytest.mark.parametrize("question,known_question", PARAPHRASES)
+def test_paraphrase_hits_similarity_tier(cache, question, known_question):
+    answer, source, _ = cache.ask(question)
+    assert source == "semantic"
+    assert answer == known_answer(known_question)
+    assert cache.model_calls == []
+
+
+@pytest.mark.parametrize("question", NEAR_MISSES)
+def test_near_miss_falls_through_to_model(cache, question):
+    answer, source, _ = cache.ask(question)
+    assert source == "model"
+    assert answer == "generated"
+    assert cache.model_calls == [question]
+
+
+def test_known_questions_do_not_match_each_other():
+    # Each known question, asked against an index of all the others, must not
+    # borrow another question's answer
+    for (question, _), others in ((KNOWN[i], KNOWN[:i] + KNOWN[i + 1:]) for i in range(len(KNOWN))):
+        faq = FAQAnswerCache(lambda q: "generated")
+        for other, answer in others:
+            faq.add_known(other, answer)
+        assert faq.ask(question)[1] == "model", question
+
+
+def test_similarity_hits_are_not_promoted_to_exact_tier(cache):
+    cache.ask("Can I cancel my booking?")
+    assert cache.ask("Can I cancel my booking?")[1] == "semantic"
+
+
+def test_index_grows_incrementally_across_blocks():
+    faq = FAQAnswerCache(lambda q: "generated")
+    for i in range(FAQAnswerCache.BLOCK_ROWS + 5):
+        faq.add_known(f"question number {i} about zone{i}", f"answer {i}")
+    assert len(faq._index_blocks) == 1
+    assert len(faq._pending_rows) == 5
+    assert faq.ask("question number 3 about zone3") == ("answer 3", "exact", 1.0)
+    assert faq.ask("Question number 260 about zone260!")[0] == "answer 260"
@@ -2,20 +2,7 @@ import json
 from transformers import AutoTokenizer, AutoModelForSeq2SeqLM, pipeline
 import os
 
-# Load the fine-tuned model and tokenizer
 MODEL_PATH = "./car-rental-finetuned"
-if not os.path.exists(MODEL_PATH):
-    raise FileNotFoundError(f"Model path '{MODEL_PATH}' not found.")
-
-tokenizer = AutoTokenizer.from_pretrained(MODEL_PATH)
-model = AutoModelForSeq2SeqLM.from_pretrained(MODEL_PATH)
-
-# Initialize the generation pipeline
-generator = pipeline(
-    "text2text-generation",
-    model=model,
-    tokenizer=tokenizer,
-)
 
 # Define a categorized list of prompts for testing
 prompts = [
@@ -72,23 +59,39 @@ generation_kwargs = {
     "num_return_sequences": 1
 }
 
-# Generate and print responses
-print("🔍 Testing fine-tuned car rental model:\n")
-results = []
-
-for idx, prompt in enumerate(prompts, start=1):
-    try:
-        response = generator(prompt, **generation_kwargs)[0]["generated_text"]
-        print(f"🔹 Prompt {idx}: {prompt}")
-        print(f"✅ Response: {response}\n")
-        results.append({"prompt": prompt, "response": response})
-    except Exception as e:
-        print(f"❌ Error generating response for prompt {idx}: {prompt}")
-        print(f"   Reason: {e}\n")
-
-# Optional: Save results to a file
-with open("car_rental_test_results.jsonl", "w", encoding="utf-8") as f:
-    for item in results:
-        f.write(json.dumps(item) + "\n")
-
-print("✅ All prompts processed and results saved to 'car_rental_test_results.jsonl'")
+# Importable without running: benchmark_backends.py reuses `prompts`
+if __name__ == "__main__":
+    # Load the fine-tuned model and tokenizer
+    if not os.path.exists(MODEL_PATH):
+        raise FileNotFoundError(f"Model path '{MODEL_PATH}' not found.")
+
+    tokenizer = AutoTokenizer.from_pretrained(MODEL_PATH)
+    model = AutoModelForSeq2SeqLM.from_pretrained(MODEL_PATH)
+
+    # Initialize the generation pipeline
+    generator = pipeline(
+        "text2text-generation",
+        model=model,
+        tokenizer=tokenizer,
+    )
+
+    # Generate and print responses
+    print("🔍 Testing fine-tuned car rental model:\n")
+    results = []
+
+    for idx, prompt in enumerate(prompts, start=1):
+        try:
+            response = generator(prompt, **generation_kwargs)[0]["generated_text"]
+            print(f"🔹 Prompt {idx}: {prompt}")
+            print(f"✅ Response: {response}\n")
+            results.append({"prompt": prompt, "response": response})
+        except Exception as e:
+            print(f"❌ Error generating response for prompt {idx}: {prompt}")
+            print(f"   Reason: {e}\n")
+
+    # Optional: Save results to a file
+    with open("car_rental_test_results.jsonl", "w", encoding="utf-8") as f:
+        for item in results:
+            f.write(json.dumps(item) + "\n")
+
+    print("✅ All prompts processed and results saved to 'car_rental_test_results.jsonl'")
@@ -0,0 +1,165 @@
+import hashlib
+import json
+import os
+import random
+import shutil
+
+from datasets import load_dataset, load_from_disk, DatasetDict
+from torch.utils.data import DataLoader, Sampler
+from transformers import Seq2SeqTrainer
+
+TOKENIZED_CACHE_DIR = "./tokenized_cache"
+
+
+def dataset_fingerprint(data_file, tokenizer, max_source_length, max_target_length,
+                        test_size, seed, pad_to_max_length=False):
+    """Hash the data file contents and every setting that affects tokenization."""
+    h = hashlib.sha256()
+    with open(data_file, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    settings = {
+        "tokenizer": tokenizer.name_or_path,
+        "tokenizer_class": type(tokenizer).__name__,
+        "vocab_size": len(tokenizer),
+        "max_source_length": max_source_length,
+        "max_target_length": max_target_length,
+        "test_size": test_size,
+        "seed": seed,
+        "pad_to_max_length": pad_to_max_length,
+    }
+    h.update(json.dumps(settings, sort_keys=True).encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+def load_tokenized_splits(data_file, tokenizer, max_source_length=128, max_target_length=128,
+                          test_size=0.1, seed=42, cache_dir=TOKENIZED_CACHE_DIR, pad_to_max_length=False):
+    """Load the JSONL dataset as tokenized train/validation splits.
+
+    No padding is applied here; DataCollatorForSeq2Seq pads each batch to its own
+    longest sequence. `pad_to_max_length` restores the old fixed-length padding
+    for baseline throughput runs. Results are saved under a fingerprinted
+    directory so later runs on the same data and tokenizer skip tokenization.
+    """
+    fingerprint = dataset_fingerprint(data_file, tokenizer, max_source_length,
+                                      max_target_length, test_size, seed, pad_to_max_length)
+    cache_path = os.path.join(cache_dir, fingerprint)
+    if os.path.exists(cache_path):
+        print(f"📦 Loaded tokenized dataset from cache: {cache_path}")
+        splits = load_from_disk(cache_path)
+        return splits["train"], splits["validation"]
+
+    dataset = load_dataset("json", data_files=data_file, split="train")
+    dataset = dataset.train_test_split(test_size=test_size, seed=seed)
+
+    padding = "max_length" if pad_to_max_length else False
+
+    def tokenize(batch):
+        model_inputs = tokenizer(batch["prompt"], padding=padding, truncation=True, max_length=max_source_length)
+        labels = tokenizer(text_target=batch["response"], padding=padding, truncation=True,
+                           max_length=max_target_length)
+        model_inputs["labels"] = labels["input_ids"]
+        return model_inputs
+
+    splits = DatasetDict({
+        "train": dataset["train"].map(tokenize, batched=True, remove_columns=["prompt", "response"]),
+        "validation": dataset["test"].map(tokenize, batched=True, remove_columns=["prompt", "response"]),
+    })
+    # Save under a temporary name and rename, so an interrupted save never looks like a valid cache
+    tmp_path = cache_path + ".tmp"
+    if os.path.exists(tmp_path):
+        shutil.rmtree(tmp_path)
+    splits.save_to_disk(tmp_path)
+    os.replace(tmp_path, cache_path)
+    print(f"💾 Saved tokenized dataset to cache: {cache_path}")
+    return splits["train"], splits["validation"]
+
+
+def sequence_lengths(dataset):
+    """Per-example (source tokens, target tokens), used for bucketing."""
+    return [(len(i), len(l)) for i, l in zip(dataset["input_ids"], dataset["labels"])]
+
+
+def padding_stats(dataset, batches=None, pad_to=None):
+    """Count real vs. padded tokens for a batching scheme (or fixed `pad_to` padding)."""
+    src = [len(x) for x in dataset["input_ids"]]
+    tgt = [len(x) for x in dataset["labels"]]
+    real = sum(src) + sum(tgt)
+    if pad_to is not None:
+        padded = len(src) * pad_to * 2
+    else:
+        padded = sum(len(b) * (max(src[i] for i in b) + max(tgt[i] for i in b)) for b in batches)
+    return real, padded
+
+
+class TokenBudgetBatchSampler(Sampler):
+    """Group examples of similar length into batches capped by a padded-token budget.
+
+    `lengths` holds (source, target) lengths. The collator pads sources and
+    targets separately, so a batch costs (longest source + longest target) *
+    batch size padded tokens, and that is what `max_tokens` caps. Batches are
+    built once from length-sorted indices (so `len()` is stable across epochs)
+    and their order is reshuffled every epoch.
+
+    `max_batch_size` keeps the example count per optimizer step close to a
+    fixed-size pipeline, so bucketing changes padding and not the schedule.
+    """
+
+    def __init__(self, lengths, max_tokens=1024, max_batch_size=8, seed=42):
+        self.seed = seed
+        self.epoch = 0
+        self.batches = []
+
+        batch, max_src, max_tgt = [], 0, 0
+        for idx in sorted(range(len(lengths)), key=lambda i: lengths[i]):
+            src, tgt = lengths[idx]
+            cost = (max(max_src, src) + max(max_tgt, tgt)) * (len(batch) + 1)
+            if batch and (cost > max_tokens or len(batch) >= max_batch_size):
+                self.batches.append(batch)
+                batch, max_src, max_tgt = [], 0, 0
+            batch.append(idx)
+            max_src, max_tgt = max(max_src, src), max(max_tgt, tgt)
+        if batch:
+            self.batches.append(batch)
+
+    def set_epoch(self, epoch):
+        self.epoch = epoch
+
+    def __iter__(self):
+        order = list(range(len(self.batches)))
+        random.Random(self.seed + self.epoch).shuffle(order)
+        self.epoch += 1
+        for i in order:
+            yield self.batches[i]
+
+    def __len__(self):
+        return len(self.batches)
+
+
+class BucketedSeq2SeqTrainer(Seq2SeqTrainer):
+    """Seq2SeqTrainer whose training batches come from a TokenBudgetBatchSampler.
+
+    Batches hold at most `max_batch_size` examples (default: the args'
+    per_device_train_batch_size), fewer when long examples hit the token budget.
+    """
+
+    def __init__(self, *args, max_tokens_per_batch=1024, max_batch_size=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_tokens_per_batch = max_tokens_per_batch
+        self.max_batch_size = max_batch_size or self.args.per_device_train_batch_size
+
+    def get_train_dataloader(self):
+        batch_sampler = TokenBudgetBatchSampler(
+            sequence_lengths(self.train_dataset),
+            max_tokens=self.max_tokens_per_batch,
+            max_batch_size=self.max_batch_size,
+            seed=self.args.seed,
+        )
+        dataloader = DataLoader(
+            self.train_dataset,
+            batch_sampler=batch_sampler,
+            collate_fn=self.data_collator,
+            num_workers=self.args.dataloader_num_workers,
+            pin_memory=self.args.dataloader_pin_memory,
+        )
+        return self.accelerator.prepare(dataloader)
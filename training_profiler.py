@@ -0,0 +1,245 @@
+import csv
+import gc
+import itertools
+import json
+import os
+import time
+
+import torch
+from transformers import TrainerCallback
+
+
+def current_rss_mb():
+    """Current resident set size of this process in MB (Linux).
+
+    Sampled instead of ru_maxrss, which is the peak over the whole process and
+    would carry earlier runs' peaks into later ones.
+    """
+    with open("/proc/self/status", "r") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+class TrainingProfilerCallback(TrainerCallback):
+    """Record step time, data-loading stalls, tokens/sec and RSS per logging step.
+
+    Token counts come from the data collator, so wrap it with `wrap_collator`
+    (with dataloader_num_workers=0 the count happens in the training process).
+    Set `profile_steps=(start, end)` to capture a torch.profiler window over
+    those global steps. A JSON and CSV report is written when training ends.
+
+    The summary's tokens/sec divides by training time only (step time plus
+    data wait); wall time, which also covers evaluation, checkpointing and
+    loading the best model, is reported separately as `wall_time_s`.
+    """
+
+    def __init__(self, output_dir="./logs/profile", profile_steps=None, verbose=True, pad_token_id=None):
+        self.output_dir = output_dir
+        self.pad_token_id = pad_token_id
+        self.profile_steps = profile_steps
+        self.verbose = verbose
+        self.records = []
+        self.summary = {}
+        self._profiler = None
+        self._reset_window()
+
+    def _reset_window(self):
+        self._window_steps = 0
+        self._window_step_time = 0.0
+        self._window_data_time = 0.0
+        self._window_tokens = 0
+        self._batch_tokens = 0
+        self._batch_examples = 0
+        self._tokens_at_step_end = 0
+        self._examples_at_step_end = 0
+        self._last_step_end = None
+        self._step_start = None
+
+    def wrap_collator(self, collator):
+        """Return a collator that counts non-padding source and target tokens per batch."""
+        def counting_collator(features):
+            batch = collator(features)
+            tokens = int(batch["attention_mask"].sum()) if "attention_mask" in batch else 0
+            if "labels" in batch:
+                real_labels = batch["labels"] != -100
+                if self.pad_token_id is not None:
+                    # Labels padded to max_length by the tokenizer use the pad id, not -100
+                    real_labels &= batch["labels"] != self.pad_token_id
+                tokens += int(real_labels.sum())
+            self._batch_tokens += tokens
+            self._batch_examples += len(features)
+            return batch
+        return counting_collator
+
+    def on_train_begin(self, args, state, control, **kwargs):
+        self.records = []
+        self._reset_window()
+        self._train_start = time.perf_counter()
+        self._total_tokens = 0
+        self._total_examples = 0
+        self._total_train_time = 0.0
+        self._start_rss = current_rss_mb()
+        self._peak_rss = self._start_rss
+
+    def on_step_begin(self, args, state, control, **kwargs):
+        now = time.perf_counter()
+        # The batch for this step was fetched between the previous step end and now
+        if self._last_step_end is not None:
+            self._window_data_time += now - self._last_step_end
+        self._step_start = now
+
+        if self.profile_steps and state.global_step == self.profile_steps[0] and self._profiler is None:
+            self._profiler = torch.profiler.profile(
+                activities=[torch.profiler.ProfilerActivity.CPU],
+                record_shapes=True,
+                profile_memory=True,
+            )
+            self._profiler.__enter__()
+
+    def on_step_end(self, args, state, control, **kwargs):
+        now = time.perf_counter()
+        self._window_step_time += now - self._step_start
+        self._window_steps += 1
+        self._last_step_end = now
+        self._tokens_at_step_end = self._batch_tokens
+        self._examples_at_step_end = self._batch_examples
+        # Peak RSS for this run only, sampled once per step
+        self._peak_rss = max(self._peak_rss, current_rss_mb())
+
+        if self._profiler is not None and state.global_step >= self.profile_steps[1]:
+            self._stop_profiler()
+
+    def on_evaluate(self, args, state, control, **kwargs):
+        # Evaluation batches go through the same collator; drop their tokens and
+        # don't count evaluation time as a data-loading stall
+        self._batch_tokens = self._tokens_at_step_end
+        self._batch_examples = self._examples_at_step_end
+        self._last_step_end = None
+
+    def on_log(self, args, state, control, logs=None, **kwargs):
+        # Only training loss logs close a window (eval and final summary logs don't)
+        if logs and "loss" in logs:
+            self._record(state, logs)
+
+    def _record(self, state, logs=None):
+        if self._window_steps == 0:
+            return
+        elapsed = self._window_step_time + self._window_data_time
+        record = {
+            "step": state.global_step,
+            "epoch": round(state.epoch or 0, 4),
+            "steps": self._window_steps,
+            "avg_step_time_s": self._window_step_time / self._window_steps,
+            "avg_data_wait_s": self._window_data_time / self._window_steps,
+            "data_wait_pct": 100 * self._window_data_time / elapsed if elapsed else 0.0,
+            "tokens": self._batch_tokens,
+            "examples": self._batch_examples,
+            "tokens_per_sec": self._batch_tokens / elapsed if elapsed else 0.0,
+            "rss_mb": current_rss_mb(),
+            "peak_rss_mb": self._peak_rss,
+            "loss": (logs or {}).get("loss"),
+        }
+        self.records.append(record)
+        self._total_tokens += self._batch_tokens
+        self._total_examples += self._batch_examples
+        self._total_train_time += elapsed
+
+        last_step_end = self._last_step_end
+        self._reset_window()
+        self._last_step_end = last_step_end
+
+    def on_train_end(self, args, state, control, **kwargs):
+        self._stop_profiler()
+        # Flush a partial window so short runs still produce a record
+        if self._window_steps:
+            self._record(state)
+
+        wall_time = time.perf_counter() - self._train_start
+        train_time = self._total_train_time
+        steps = sum(r["steps"] for r in self.records)
+        self.summary = {
+            "total_steps": steps,
+            "train_time_s": train_time,
+            "wall_time_s": wall_time,
+            "total_tokens": self._total_tokens,
+            "tokens_per_sec": self._total_tokens / train_time if train_time else 0.0,
+            "avg_batch_size": self._total_examples / steps if steps else 0.0,
+            "avg_step_time_s": sum(r["avg_step_time_s"] * r["steps"] for r in self.records) / steps if steps else 0.0,
+            "avg_data_wait_s": sum(r["avg_data_wait_s"] * r["steps"] for r in self.records) / steps if steps else 0.0,
+            "start_rss_mb": self._start_rss,
+            "peak_rss_mb": self._peak_rss,
+            "peak_rss_delta_mb": self._peak_rss - self._start_rss,
+            "torch_threads": torch.get_num_threads(),
+        }
+        self.write_report()
+
+        if self.verbose:
+            print("📈 Training profile summary:")
+            for key, value in self.summary.items():
+                print(f"   {key}: {value:.4f}" if isinstance(value, float) else f"   {key}: {value}")
+
+    def _stop_profiler(self):
+        if self._profiler is None:
+            return
+        self._profiler.__exit__(None, None, None)
+        os.makedirs(self.output_dir, exist_ok=True)
+        self._profiler.export_chrome_trace(os.path.join(self.output_dir, "trace.json"))
+        with open(os.path.join(self.output_dir, "profile_ops.txt"), "w", encoding="utf-8") as f:
+            f.write(self._profiler.key_averages().table(sort_by="self_cpu_time_total", row_limit=30))
+        self._profiler = None
+
+    def write_report(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        with open(os.path.join(self.output_dir, "training_profile.json"), "w", encoding="utf-8") as f:
+            json.dump({"summary": self.summary, "records": self.records}, f, indent=2)
+
+        if self.records:
+            with open(os.path.join(self.output_dir, "training_profile.csv"), "w", newline="", encoding="utf-8") as f:
+                writer = csv.DictWriter(f, fieldnames=list(self.records[0].keys()))
+                writer.writeheader()
+                writer.writerows(self.records)
+
+
+def run_throughput_benchmark(make_trainer, batch_sizes=(8, 16, 32), thread_counts=(1, 2, 4),
+                             grad_accum_steps=(1,), max_steps=20, output_dir="./logs/benchmark"):
+    """Train for a fixed number of steps over every setting combination and compare throughput.
+
+    `make_trainer(batch_size, grad_accum, max_steps, callback)` must return a fresh
+    trainer that uses `callback` (and its `wrap_collator`) for the given setting.
+    """
+    results = []
+    original_threads = torch.get_num_threads()
+
+    for batch_size, threads, grad_accum in itertools.product(batch_sizes, thread_counts, grad_accum_steps):
+        torch.set_num_threads(threads)
+        run_dir = os.path.join(output_dir, f"bs{batch_size}_t{threads}_ga{grad_accum}")
+        callback = TrainingProfilerCallback(output_dir=run_dir, verbose=False)
+        trainer = make_trainer(batch_size, grad_accum, max_steps, callback)
+        trainer.train()
+        # Free this run's model and optimizer before the next run samples its starting RSS
+        del trainer
+        gc.collect()
+
+        result = {"batch_size": batch_size, "threads": threads, "grad_accum": grad_accum}
+        result.update(callback.summary)
+        results.append(result)
+        print(f"⏱️ bs={batch_size} threads={threads} grad_accum={grad_accum}: "
+              f"{result['tokens_per_sec']:.0f} tokens/sec, {result['avg_step_time_s']:.3f}s/step, "
+              f"peak RSS +{result['peak_rss_delta_mb']:.0f} MB over {result['start_rss_mb']:.0f} MB at start")
+
+    torch.set_num_threads(original_threads)
+
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, "benchmark.json"), "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    with open(os.path.join(output_dir, "benchmark.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(results[0].keys()))
+        writer.writeheader()
+        writer.writerows(results)
+
+    best = max(results, key=lambda r: r["tokens_per_sec"])
+    print(f"🏆 Best setting: bs={best['batch_size']} threads={best['threads']} "
+          f"grad_accum={best['grad_accum']} ({best['tokens_per_sec']:.0f} tokens/sec)")
+    return results